@@ -0,0 +1,127 @@
+from functools import cache, cached_property
+from pathlib import Path
+
+from avulto import DMM, Path as p
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+MAP_SIZE = 255
+
+FONT_PATH = Path(__file__).parent / "Minimal5x7.ttf"
+
+# Every area and turf path seen in any map gets a single ID, so planes of
+# different maps can be compared directly. ID 0 means there is no tile.
+path_ids: dict[str, int] = dict()
+
+map_cache: dict[Path, "MapModel"] = dict()
+
+
+def path_id(path) -> int:
+    return path_ids.setdefault(str(path), len(path_ids) + 1)
+
+
+@cache
+def child_of(path: str, parent: str) -> bool:
+    return p(path).child_of(parent)
+
+
+class MapModel:
+    def __init__(self, dmm: DMM):
+        self.dmm = dmm
+
+    @property
+    def extents(self):
+        return self.dmm.extents
+
+    # Area and turf IDs indexed by tile [x, y] on the first z-level, read from
+    # the map in a single pass.
+    @cached_property
+    def _planes(self) -> tuple[np.ndarray, np.ndarray]:
+        shape = (self.extents[0] + 1, self.extents[1] + 1)
+        areas = np.zeros(shape, dtype=np.int32)
+        turfs = np.zeros(shape, dtype=np.int32)
+        for coord in self.dmm.coords():
+            if coord[2] != 1:
+                continue
+            tile = self.dmm.tiledef(*coord)
+            areas[coord[0], coord[1]] = path_id(tile.area_path())
+            turfs[coord[0], coord[1]] = path_id(tile.turf_path())
+
+        return areas, turfs
+
+    @property
+    def area_plane(self) -> np.ndarray:
+        return self._planes[0]
+
+    @property
+    def turf_plane(self) -> np.ndarray:
+        return self._planes[1]
+
+    # The IDs of the area paths present on the map
+    @cached_property
+    def areas(self) -> dict[str, int]:
+        present = set(np.unique(self.area_plane).tolist())
+        return {path: id for path, id in path_ids.items() if id in present}
+
+
+# Maps are cached under the path they were asked for, so repeat lookups don't
+# touch the filesystem, and under their resolved path, so different spellings
+# of the same path share one model.
+def load_map(path: Path) -> MapModel:
+    if path not in map_cache:
+        resolved = Path(path).resolve()
+        if resolved not in map_cache:
+            map_cache[resolved] = MapModel(DMM.from_file(resolved))
+        map_cache[path] = map_cache[resolved]
+
+    return map_cache[path]
+
+
+def plane_child_of(plane: np.ndarray, parent: str) -> np.ndarray:
+    ids = [id for path, id in path_ids.items() if child_of(path, parent)]
+    return np.isin(plane, ids)
+
+
+# Tile coordinates to image coordinates at one pixel per tile, for a map
+# `height` tiles tall. Works on scalars and arrays alike.
+def DMCOORD(x, y, height=MAP_SIZE):
+    return (x - 1, (height - y))
+
+
+# Polygon coordinates from rasterio are (column, row) of a plane indexed by
+# tile [x, y]. Each vertex is the top left corner of a tile's pixels.
+def ring_to_image(ring, zoom=1, height=MAP_SIZE) -> list[tuple[int, int]]:
+    return [
+        (int(px * zoom), int(py * zoom))
+        for px, py in (DMCOORD(x, y - 1, height) for (y, x) in ring)
+    ]
+
+
+# The same transform as DMCOORD, applied to a whole plane. The height is the
+# plane's own, so rings drawn over it must be given the same height.
+def plane_to_image(plane: np.ndarray) -> np.ndarray:
+    return plane.swapaxes(0, 1)[::-1][:-1, 1:]
+
+
+@cache
+def load_font(size=16) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(str(FONT_PATH), size)
+
+
+_measure_draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+_measure_draw.fontmode = "1"
+
+
+@cache
+def _centered_offset(font, msg: str) -> tuple[float, float]:
+    left, top, right, bottom = _measure_draw.textbbox((0, 0), msg, font=font)
+    return (
+        left - ((right - left) / 2),
+        top - ((bottom - top) / 2),
+    )
+
+
+def draw_centered_text(draw: ImageDraw.ImageDraw, xy, msg: str, fill, font=None):
+    font = font or load_font()
+    x_offset, y_offset = _centered_offset(font, msg)
+    draw.text((xy[0] + x_offset, xy[1] + y_offset), msg, fill=fill, font=font)
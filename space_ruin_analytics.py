@@ -0,0 +1,226 @@
+import csv
+from collections import defaultdict
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, or_, select
+
+import toml
+
+import click
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+
+from ss13_blackbox_tools.model import Round
+from ss13_wiki_tools.map_model import MAP_SIZE
+from ss13_wiki_tools.space_ruin_areamap import (
+    SAFE_BORDER,
+    TRANSITION_BORDER,
+    RuinPlacement,
+    load_ruin_map,
+    parse_ruin_placements,
+)
+
+# Ruin rectangles must stay on tiles in [lower, upper] to avoid each zone.
+TRANSITION_BOUNDS = (TRANSITION_BORDER, MAP_SIZE - TRANSITION_BORDER)
+PADDING_BOUNDS = (
+    TRANSITION_BORDER + SAFE_BORDER,
+    MAP_SIZE - TRANSITION_BORDER - SAFE_BORDER,
+)
+
+
+# Bounds are inclusive tile coordinates; the boxes cover the full extent of
+# each tile so that adjacent ruins touch instead of overlapping.
+def ruin_boxes(ruins: list[RuinPlacement]):
+    bounds = np.array(
+        [[*p0, *p1] for p0, p1 in (ruin.ruin_rect() for ruin in ruins)],
+        dtype=np.int32,
+    ).reshape(-1, 4)
+    boxes = shapely.box(bounds[:, 0], bounds[:, 1], bounds[:, 2] + 1, bounds[:, 3] + 1)
+
+    return bounds, boxes
+
+
+def outside_bounds(bounds: np.ndarray, zone: tuple[int, int]) -> np.ndarray:
+    lower, upper = zone
+    return (bounds[:, :2] < lower).any(axis=1) | (bounds[:, 2:] > upper).any(axis=1)
+
+
+# Candidate pairs come from an STRtree query instead of comparing every ruin
+# against every other, so the cost grows with the number of placements and not
+# the number of pairs.
+def analyze_z_level(round_id: int, z_level: int, ruins: list[RuinPlacement]):
+    findings = list()
+    bounds, boxes = ruin_boxes(ruins)
+    tree = STRtree(boxes)
+
+    left, right = tree.query(boxes, predicate="intersects")
+    pairs = left < right
+    left, right = left[pairs], right[pairs]
+    areas = shapely.area(shapely.intersection(boxes[left], boxes[right]))
+    overlapping = np.zeros(len(ruins), dtype=bool)
+    overlapping[left[areas > 0]] = True
+    overlapping[right[areas > 0]] = True
+    for i, j, area in zip(left, right, areas):
+        if area <= 0:
+            continue
+        findings.append(
+            {
+                "round_id": round_id,
+                "z_level": z_level,
+                "kind": "overlap",
+                "ruin": ruins[i].map,
+                "coords": ruins[i].coords,
+                "other": ruins[j].map,
+                "tiles": int(area),
+            }
+        )
+
+    crosses_transition = outside_bounds(bounds, TRANSITION_BOUNDS)
+    crosses_padding = outside_bounds(bounds, PADDING_BOUNDS) & ~crosses_transition
+    for kind, mask in (
+        ("transition_edge", crosses_transition),
+        ("placement_padding", crosses_padding),
+    ):
+        for i in np.flatnonzero(mask):
+            findings.append(
+                {
+                    "round_id": round_id,
+                    "z_level": z_level,
+                    "kind": kind,
+                    "ruin": ruins[i].map,
+                    "coords": ruins[i].coords,
+                    "other": "",
+                    "tiles": "",
+                }
+            )
+
+    spacing = list()
+    if len(ruins) > 1:
+        (sources, nearest), gaps = tree.query_nearest(
+            boxes, exclusive=True, return_distance=True, all_matches=False
+        )
+        for i, j, gap in zip(sources, nearest, gaps):
+            spacing.append(
+                {
+                    "round_id": round_id,
+                    "z_level": z_level,
+                    "ruin": ruins[i].map,
+                    "coords": ruins[i].coords,
+                    "nearest": ruins[j].map,
+                    "nearest_gap": float(gap),
+                    "overlapping": bool(overlapping[i]),
+                }
+            )
+
+    return findings, spacing
+
+
+def analyze_rounds(placements_by_round: dict[int, list[RuinPlacement]]):
+    by_level: dict[tuple[int, int], list[RuinPlacement]] = defaultdict(list)
+    for round_id, ruins in placements_by_round.items():
+        for ruin in ruins:
+            load_ruin_map(ruin.map)
+            by_level[(round_id, ruin.coords[2])].append(ruin)
+
+    findings = list()
+    spacing = list()
+    for (round_id, z_level), ruins in sorted(by_level.items()):
+        level_findings, level_spacing = analyze_z_level(round_id, z_level, ruins)
+        findings.extend(level_findings)
+        spacing.extend(level_spacing)
+
+    return findings, spacing
+
+
+def print_summary(placements_by_round, findings, spacing):
+    placement_count = sum(len(ruins) for ruins in placements_by_round.values())
+    print(f"rounds={len(placements_by_round)} placements={placement_count}")
+
+    counts = defaultdict(int)
+    for finding in findings:
+        counts[finding["kind"]] += 1
+    for kind in ("overlap", "transition_edge", "placement_padding"):
+        print(f"{kind}={counts[kind]}")
+
+    if spacing:
+        gaps = np.array([row["nearest_gap"] for row in spacing])
+        overlapping = np.array([row["overlapping"] for row in spacing])
+        # Overlapping ruins are also 0 tiles apart but are already counted above
+        print(
+            f"nearest gap: min={gaps.min():.1f} mean={gaps.mean():.1f} "
+            f"median={np.median(gaps):.1f} max={gaps.max():.1f} "
+            f"touching={np.count_nonzero((gaps == 0) & ~overlapping)}"
+        )
+
+
+def write_rows(rows, fieldnames, output_file: Path):
+    with open(output_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "coords": ",".join(str(c) for c in row["coords"])})
+
+
+@click.command()
+@click.option("--output_path", required=True)
+@click.option("--round_id", multiple=True, type=int)
+@click.option("--first_round", type=int)
+@click.option("--last_round", type=int)
+def main(output_path, round_id, first_round, last_round):
+    if (first_round is None) != (last_round is None):
+        raise click.UsageError("pass both --first_round and --last_round")
+    if not round_id and first_round is None:
+        raise click.UsageError("pass --round_id or --first_round/--last_round")
+
+    round_filters = list()
+    if round_id:
+        round_filters.append(Round.id.in_(round_id))
+    if first_round is not None:
+        round_filters.append(Round.id.between(first_round, last_round))
+
+    config = toml.load(open("ss13_blackbox_tools/config.toml"))
+    connection_string = config["database"]["prod_connection_string"]
+    engine = create_engine(connection_string)
+    placements_by_round: dict[int, list[RuinPlacement]] = dict()
+    with Session(engine) as session:
+        rounds = session.scalars(
+            select(Round).where(or_(*round_filters)).order_by(Round.id)
+        )
+        for round in rounds:
+            if not round.has_feedback("ruin_placement"):
+                print(f"skipping round {round.id}: no ruin placement found")
+                continue
+
+            placements_by_round[round.id] = parse_ruin_placements(
+                round.feedback("ruin_placement")
+            )
+
+    findings, spacing = analyze_rounds(placements_by_round)
+    print_summary(placements_by_round, findings, spacing)
+
+    output_path = Path(output_path)
+    output_path.mkdir(parents=True, exist_ok=True)
+    write_rows(
+        findings,
+        ["round_id", "z_level", "kind", "ruin", "coords", "other", "tiles"],
+        output_path / "ruin_placement_analytics.csv",
+    )
+    write_rows(
+        spacing,
+        [
+            "round_id",
+            "z_level",
+            "ruin",
+            "coords",
+            "nearest",
+            "nearest_gap",
+            "overlapping",
+        ],
+        output_path / "ruin_placement_spacing.csv",
+    )
+
+
+if __name__ == "__main__":
+    main()
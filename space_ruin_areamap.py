@@ -1,4 +1,7 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import cache
 from pathlib import Path
 
 from sqlalchemy.orm import Session
@@ -7,18 +10,23 @@ from sqlalchemy import create_engine
 import toml
 
 import click
-from avulto import DMM
-import rasterio.features
-from shapely.geometry import Polygon
-from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
 
 from ss13_blackbox_tools.model import Round
+from ss13_wiki_tools.map_model import (
+    DMCOORD,
+    MAP_SIZE,
+    MapModel,
+    draw_centered_text,
+    load_font,
+    load_map,
+    plane_child_of,
+)
 
 
 ZOOM_LEVEL = 4
 
-dmm_cache: dict[str, DMM] = dict()
-
 ruin_root = Path(
     "D:/ExternalRepos/third_party/Paradise/_maps/map_files/RandomRuins/SpaceRuins"
 )
@@ -32,6 +40,9 @@ RUIN_TILE_COLOR = "#8080ffff"
 RUIN_NEARSPACE_COLOR = "#6060a0ff"
 TEXT_COLOR = "#ffffffff"
 
+TRANSITION_BORDER = 7
+SAFE_BORDER = 15  # TRANSITIONEDGE + SPACERUIN_MAP_EDGE_PAD
+
 
 @dataclass(frozen=True)
 class RuinPlacement:
@@ -39,7 +50,7 @@ class RuinPlacement:
     coords: tuple[int, int, int]
 
     def ruin_rect(self):
-        ruin_map = dmm_cache[self.map]
+        ruin_map = load_ruin_map(self.map)
         ruin_width = ruin_map.extents[0]
         ruin_height = ruin_map.extents[1]
         ruin_x0 = self.coords[0] - int(ruin_width / 2)
@@ -50,7 +61,7 @@ class RuinPlacement:
         return [(ruin_x0, ruin_y0), (ruin_x1, ruin_y1)]
 
     def shapely_rect(self):
-        ruin_map = dmm_cache[self.map]
+        ruin_map = load_ruin_map(self.map)
         ruin_rect = self.ruin_rect()
         ruin_x0, ruin_y0 = DMCOORD(*ruin_rect[0])
         # ruin_x0 = ruin_rect[0][0]
@@ -63,138 +74,139 @@ class RuinPlacement:
         ]
 
 
-def DMCOORD(x, y):
-    return (x - 1, (255 - y - 1))
+@cache
+def load_ruin_map(map_name: str) -> MapModel:
+    return load_map(ruin_root / map_name)
 
 
-def render_z_levels(ruin_data, output_path: Path):
-    fnt = ImageFont.truetype("ss13_wiki_tools/Minimal5x7.ttf", 16)
-
+def parse_ruin_placements(ruin_data) -> list[RuinPlacement]:
     space_ruins: list[RuinPlacement] = list()
-    z_levels = set()
-
-    transition_border = 7
-    safe_border = 15  # TRANSITIONEDGE + SPACERUIN_MAP_EDGE_PAD
-    transition_rect = (
-        DMCOORD(transition_border, transition_border),
-        DMCOORD(255 - transition_border, 255 - transition_border),
-    )
-
-    safe_rect = (
-        DMCOORD(transition_border + safe_border, transition_border + safe_border),
-        DMCOORD(
-            255 - transition_border - safe_border, 255 - transition_border - safe_border
-        ),
-    )
-
     for ruin in ruin_data.values():
         coords = [int(c) for c in ruin["coords"].split(",")]
         if coords[2] == 3:
             continue
 
-        space_ruins.append(RuinPlacement(ruin["map"], coords))
-        z_levels.add(coords[2])
+        space_ruins.append(RuinPlacement(ruin["map"], tuple(coords)))
+
+    return space_ruins
+
+
+# Tiles inside the ruin placement padding and inside the safe zone, in the
+# same inclusive DM tile coordinates as RuinPlacement.ruin_rect.
+TRANSITION_RECT = [
+    (TRANSITION_BORDER, TRANSITION_BORDER),
+    (MAP_SIZE - TRANSITION_BORDER, MAP_SIZE - TRANSITION_BORDER),
+]
+SAFE_RECT = [
+    (TRANSITION_BORDER + SAFE_BORDER, TRANSITION_BORDER + SAFE_BORDER),
+    (
+        MAP_SIZE - TRANSITION_BORDER - SAFE_BORDER,
+        MAP_SIZE - TRANSITION_BORDER - SAFE_BORDER,
+    ),
+]
+
+
+def fill_tiles(layer: np.ndarray, rect, color):
+    (x0, y0), (x1, y1) = rect
+    col0, row1 = DMCOORD(x0, y0)
+    col1, row0 = DMCOORD(x1, y1)
+    layer[max(row0, 0) : max(row1 + 1, 0), max(col0, 0) : max(col1 + 1, 0)] = color
+
+
+# The drawn tiles only depend on the ruin map itself, so each map is classified
+# once no matter how many rounds or z-levels it is placed on.
+@cache
+def ruin_tiles(map_name: str):
+    ruin_map = load_ruin_map(map_name)
+    areas = ruin_map.area_plane
+    turfs = ruin_map.turf_plane
+    is_nearstation = plane_child_of(areas, "/area/space/nearstation")
+    is_skipped = (
+        plane_child_of(areas, "/area/space")
+        | plane_child_of(areas, "/area/template_noop")
+        | plane_child_of(turfs, "/turf/template_noop")
+    )
+    xs, ys = np.nonzero((areas != 0) & (is_nearstation | ~is_skipped))
+    colors = np.where(
+        is_nearstation[xs, ys, np.newaxis],
+        np.array(ImageColor.getrgb(RUIN_NEARSPACE_COLOR), dtype=np.uint8),
+        np.array(ImageColor.getrgb(RUIN_TILE_COLOR), dtype=np.uint8),
+    )
+
+    return np.stack([xs, ys], axis=1), colors
+
 
-    for z_level in z_levels:
-        image = Image.new(
-            size=(255, 255),
-            mode="RGBA",
+def base_layer(ruins: list[RuinPlacement]) -> np.ndarray:
+    layer = np.empty((MAP_SIZE, MAP_SIZE, 4), dtype=np.uint8)
+    layer[:] = ImageColor.getrgb(TRANSITZONE_COLOR)
+    fill_tiles(layer, TRANSITION_RECT, ImageColor.getrgb(RUIN_PADDING_COLOR))
+    fill_tiles(layer, SAFE_RECT, ImageColor.getrgb(SAFE_ZONE_COLOR))
+
+    for ruin in ruins:
+        ruin_rect = ruin.ruin_rect()
+        fill_tiles(layer, ruin_rect, ImageColor.getrgb(RUIN_RECT_COLOR))
+
+        offsets, colors = ruin_tiles(ruin.map)
+        ruin_x0, ruin_y0 = ruin_rect[0]
+        cols, rows = DMCOORD(ruin_x0 + offsets[:, 0] - 1, ruin_y0 + offsets[:, 1] - 1)
+        on_map = (cols >= 0) & (cols < MAP_SIZE) & (rows >= 0) & (rows < MAP_SIZE)
+        layer[rows[on_map], cols[on_map]] = colors[on_map]
+
+    return layer
+
+
+def render_z_level(z_level: int, ruins: list[RuinPlacement], output_path: Path):
+    # Compose the base layer at one pixel per tile and scale it up afterwards
+    # because fuck dealing with trying to calculate offsets of rectangles while
+    # drawing them zoomed in
+    layer = base_layer(ruins)
+    layer = layer.repeat(ZOOM_LEVEL, axis=0).repeat(ZOOM_LEVEL, axis=1)
+    image = Image.fromarray(layer, mode="RGBA")
+
+    draw = ImageDraw.Draw(image)
+    draw.fontmode = "1"
+
+    draw.rectangle(
+        (0, 0, MAP_SIZE * ZOOM_LEVEL - 1, MAP_SIZE * ZOOM_LEVEL - 1),
+        outline=(255, 255, 255),
+        fill=None,
+    )
+
+    for ruin in ruins:
+        ruin_map = load_ruin_map(ruin.map)
+        ruin_x0, ruin_y0 = ruin.shapely_rect()[0]
+        centroid = (
+            (ruin_x0 + ruin_map.extents[0] / 2) * ZOOM_LEVEL,
+            (ruin_y0 - ruin_map.extents[1] / 2) * ZOOM_LEVEL,
         )
-        draw = ImageDraw.Draw(image)
-        draw.fontmode = "1"
-
-        draw.rectangle([0, 0, 255, 255], fill=TRANSITZONE_COLOR)
-
-        draw.rectangle(transition_rect, fill=RUIN_PADDING_COLOR)
-        draw.rectangle(safe_rect, fill=SAFE_ZONE_COLOR)
-
-        for ruin in space_ruins:
-            if ruin.coords[2] != z_level:
-                continue
-
-            if ruin.map not in dmm_cache:
-                dmm_cache[ruin.map] = DMM.from_file(ruin_root / ruin.map)
-
-            ruin_rect = ruin.ruin_rect()
-            print(f"ruin={ruin.map}, coords={ruin.coords}")
-
-            draw.rectangle(
-                (DMCOORD(*ruin_rect[0]), DMCOORD(*ruin_rect[1])),
-                fill=RUIN_RECT_COLOR,
-                outline=None,
-            )
-
-            ruin_map = dmm_cache[ruin.map]
-            ruin_rect = ruin.ruin_rect()
-            ruin_x0, ruin_y0 = ruin_rect[0]
-            for coord in ruin_map.coords():
-                tile = ruin_map.tiledef(*coord)
-                is_space = tile.area_path().child_of("/area/space")
-                is_noop = tile.area_path().child_of("/area/template_noop")
-                is_nearstation = tile.area_path().child_of("/area/space/nearstation")
-                if not is_nearstation and (is_space or is_noop):
-                    continue
-                if not is_nearstation and tile.turf_path().child_of(
-                    "/turf/template_noop"
-                ):
-                    continue
-
-                color = RUIN_TILE_COLOR
-                if is_nearstation:
-                    color = RUIN_NEARSPACE_COLOR
-
-                draw.point(
-                    [DMCOORD(ruin_x0 + coord[0] - 1, ruin_y0 + coord[1] - 1)],
-                    fill=color,
-                )
-
-        # Scale up after we draw the rectangles because fuck dealing with trying
-        # to calculate offsets of rectangles while drawing them zoomed in
-        image = image.resize(
-            (255 * ZOOM_LEVEL, 255 * ZOOM_LEVEL), resample=Image.Resampling.NEAREST
+        msg = ruin.map.replace(".dmm", "")
+        draw_centered_text(draw, centroid, msg, fill=TEXT_COLOR)
+
+    for msg, y_pos in (("TRANSITION EDGE", 16), ("RUIN PLACEMENT PADDING", 40)):
+        draw_centered_text(
+            draw, (MAP_SIZE * ZOOM_LEVEL / 2, y_pos), msg, fill=TEXT_COLOR
         )
 
-        draw = ImageDraw.Draw(image)
-        draw.fontmode = "1"
+    image.save(output_path / f"space_ruin_{z_level}.png")
 
-        draw.rectangle(
-            (0, 0, 255 * ZOOM_LEVEL - 1, 255 * ZOOM_LEVEL - 1),
-            outline=(255, 255, 255),
-            fill=None,
-        )
 
-        for ruin in space_ruins:
-            if ruin.coords[2] != z_level:
-                continue
-
-            shapely_coords = ruin.shapely_rect()
-            msg = ruin.map.replace(".dmm", "")
-
-            shapely_poly = Polygon(
-                [x * ZOOM_LEVEL, y * ZOOM_LEVEL] for x, y in shapely_coords
-            )
-            centroid = shapely_poly.centroid
-            rect = draw.textbbox(xy=(centroid.x, centroid.y), text=msg)
-            (left, top, right, bottom) = rect
-            text_xy = (
-                left - ((right - left) / 2),
-                top - ((bottom - top) / 2),
-            )
-            draw.text(text_xy, msg, fill=TEXT_COLOR, font=fnt)
-
-        for msg, y_pos in (("TRANSITION EDGE", 16), ("RUIN PLACEMENT PADDING", 40)):
-            rect = draw.textbbox(xy=(255 * ZOOM_LEVEL / 2, y_pos), text=msg, font=fnt)
-            (left, top, right, bottom) = rect
-            text_xy = (
-                left - ((right - left) / 2),
-                top - ((bottom - top) / 2),
-            )
-            draw.text(text_xy, msg, fill=TEXT_COLOR, font=fnt)
-
-        # draw.text((255*ZOOM_LEVEL / 2, 8), text="transition edge", fill=TEXT_COLOR)
-        # draw.text((255*ZOOM_LEVEL / 2, 24), text="ruin placement padding", fill=TEXT_COLOR)
-
-        image.save(output_path / f"space_ruin_{z_level}.png")
+def render_z_levels(ruin_data, output_path: Path):
+    # Load the font and classify every ruin up front so the z-levels below
+    # only read from the caches while they render concurrently.
+    load_font()
+    ruins_by_z_level: dict[int, list[RuinPlacement]] = defaultdict(list)
+    for ruin in parse_ruin_placements(ruin_data):
+        ruin_tiles(ruin.map)
+        print(f"ruin={ruin.map}, coords={ruin.coords}")
+        ruins_by_z_level[ruin.coords[2]].append(ruin)
+
+    with ThreadPoolExecutor() as executor:
+        futures = [
+            executor.submit(render_z_level, z_level, ruins, output_path)
+            for z_level, ruins in ruins_by_z_level.items()
+        ]
+        for future in futures:
+            future.result()
 
 
 @click.command()